@@ -0,0 +1,27 @@
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 从 bundle.js 抓取的 App ID / 密钥缓存有效期 (7 天)
+TTL = 7 * 86400
+
+
+def load(cache_file, ttl=TTL):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if time.time() - cache["ts"] < ttl:
+            return cache["app_id"], cache["secrets"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def save(cache_file, app_id, secrets):
+    try:
+        with open(cache_file, "w") as f:
+            json.dump({"app_id": app_id, "secrets": list(secrets), "ts": time.time()}, f)
+    except OSError as e:
+        logger.debug(f"Failed to save bundle cache: {e}")
@@ -1,14 +1,16 @@
 import configparser
 import hashlib
 import logging
-import glob
 import os
+import pickle
 import sys
 
+from qobuz_dl import bundle_cache
 from qobuz_dl.bundle import Bundle
 from qobuz_dl.color import RED, YELLOW, GREEN, OFF
 from qobuz_dl.commands import qobuz_dl_args
 from qobuz_dl.core import QobuzDL
+from qobuz_dl.exceptions import InvalidAppIdError, InvalidAppSecretError
 try:
     from qobuz_dl.downloader import DEFAULT_FOLDER, DEFAULT_TRACK
 except ImportError:
@@ -25,12 +27,20 @@ if os.name == "nt":
 else:
     OS_CONFIG = os.path.join(os.environ["HOME"], ".config")
 
+if os.name == "nt":
+    OS_CACHE = os.environ.get("LOCALAPPDATA") or OS_CONFIG
+else:
+    OS_CACHE = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.environ["HOME"], ".cache")
+
 CONFIG_PATH = os.path.join(OS_CONFIG, "qobuz-dl")
 CONFIG_FILE = os.path.join(CONFIG_PATH, "config.ini")
+CONFIG_CACHE = os.path.join(CONFIG_PATH, "config.pkl")
 QOBUZ_DB = os.path.join(CONFIG_PATH, "qobuz_dl.db")
+BUNDLE_CACHE = os.path.join(CONFIG_PATH, "bundle.json")
+META_CACHE = os.path.join(OS_CACHE, "qobuz-dl", "meta.json")
 
 
-def _reset_config(config_file):
+def _reset_config(config_file, use_bundle_cache=True):
     console.rule("[bold cyan]初始化配置[/]")
     console.print(f"[yellow]正在创建配置文件: {config_file}[/]")
     config = configparser.ConfigParser()
@@ -52,6 +62,7 @@ def _reset_config(config_file):
     config["DEFAULT"]["default_quality"] = quality_input if quality_input else "27"
     
     config["DEFAULT"]["default_limit"] = "20"
+    config["DEFAULT"]["url_workers"] = "4"
     
     # 默认设置
     defaults = {
@@ -63,27 +74,77 @@ def _reset_config(config_file):
     for k, v in defaults.items():
         config["DEFAULT"][k] = v
 
-    console.print("\n[yellow]正在获取 App ID 和密钥 (Bundle)...[/]")
-    try:
-        bundle = Bundle()
-        config["DEFAULT"]["app_id"] = str(bundle.get_app_id())
-        config["DEFAULT"]["secrets"] = ",".join(bundle.get_secrets().values())
-        console.print("[green]密钥获取成功！[/]")
-    except Exception as e:
-        console.print(f"[bold red]获取密钥失败: {e}[/]")
-        sys.exit(1)
+    # 显式 qd -r 通常是因为密钥失效，此时必须重新抓取 bundle
+    cached = bundle_cache.load(BUNDLE_CACHE) if use_bundle_cache else None
+    if cached:
+        app_id, secrets = cached
+        console.print("\n[green]使用缓存的 App ID 和密钥[/]")
+    else:
+        console.print("\n[yellow]正在获取 App ID 和密钥 (Bundle)...[/]")
+        try:
+            bundle = Bundle()
+            app_id = str(bundle.get_app_id())
+            secrets = list(bundle.get_secrets().values())
+            bundle_cache.save(BUNDLE_CACHE, app_id, secrets)
+            console.print("[green]密钥获取成功！[/]")
+        except Exception as e:
+            console.print(f"[bold red]获取密钥失败: {e}[/]")
+            sys.exit(1)
+    config["DEFAULT"]["app_id"] = app_id
+    config["DEFAULT"]["secrets"] = ",".join(secrets)
 
     with open(config_file, "w") as configfile:
         config.write(configfile)
+    try:
+        os.remove(CONFIG_CACHE)
+    except OSError: pass
     console.print(f"[bold green]配置已保存！请重新运行命令开始下载。[/]")
 
 
+def _walk_leftovers(directory):
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _walk_leftovers(entry.path)
+                # .dl-*.part 为下载中的临时文件，.NN.tmp 为旧版本遗留
+                elif entry.name.startswith(".") and entry.name.endswith((".part", ".tmp")):
+                    yield entry.path
+    except OSError:
+        return
+
+
 def _remove_leftovers(directory):
-    directory = os.path.join(directory, "**", ".*.tmp")
-    for i in glob.glob(directory, recursive=True):
+    for path in _walk_leftovers(directory):
+        try:
+            os.remove(path)
+        except OSError: pass
+
+
+def _load_config():
+    # config.ini 未修改 (mtime_ns 与大小完全一致) 时直接读取 pickle 缓存，跳过 ConfigParser 解析
+    try:
+        st = os.stat(CONFIG_FILE)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    try:
+        with open(CONFIG_CACHE, "rb") as f:
+            cached_stamp, d = pickle.load(f)
+        if stamp is not None and cached_stamp == stamp:
+            return d
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    d = dict(config["DEFAULT"])
+    if stamp is not None:
         try:
-            os.remove(i)
-        except: pass
+            with open(CONFIG_CACHE, "wb") as f:
+                pickle.dump((stamp, d), f)
+        except OSError: pass
+    return d
 
 
 def _initial_checks():
@@ -95,16 +156,19 @@ def _initial_checks():
 def main():
     _initial_checks()
 
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
-
     try:
         # 读取配置
-        d = config["DEFAULT"]
+        d = _load_config()
         secrets = [s for s in d["secrets"].split(",") if s]
-        
+        # 布尔开关只解析一次
+        flags = {
+            k: configparser.ConfigParser.BOOLEAN_STATES[d[k].lower()]
+            for k in ("embed_art", "albums_only", "no_m3u", "og_cover", "no_cover", "smart_discography")
+        }
+
         args = qobuz_dl_args(
-            d["default_quality"], d["default_limit"], d["default_folder"]
+            d["default_quality"], d["default_limit"], d["default_folder"],
+            int(d.get("url_workers", "4"))
         ).parse_args()
         
     except Exception:
@@ -113,14 +177,19 @@ def main():
         return
 
     if args.reset:
-        _reset_config(CONFIG_FILE)
+        _reset_config(CONFIG_FILE, use_bundle_cache=False)
         return
 
     if args.purge:
-        try:
-            os.remove(QOBUZ_DB)
+        # WAL 模式下残留的 -wal/-shm 可能被回放到新建的数据库中，必须一并删除
+        removed = False
+        for path in (QOBUZ_DB, QOBUZ_DB + "-wal", QOBUZ_DB + "-shm"):
+            try:
+                os.remove(path)
+                removed = True
+            except OSError: pass
+        if removed:
             console.print("[green]已清空下载记录数据库。[/]")
-        except: pass
         return
 
     if not args.urls:
@@ -132,16 +201,19 @@ def main():
     qobuz = QobuzDL(
         args.directory,
         args.quality,
-        args.embed_art or config.getboolean("DEFAULT", "embed_art"),
-        ignore_singles_eps=args.albums_only or config.getboolean("DEFAULT", "albums_only"),
-        no_m3u_for_playlists=args.no_m3u or config.getboolean("DEFAULT", "no_m3u"),
+        args.embed_art or flags["embed_art"],
+        ignore_singles_eps=args.albums_only or flags["albums_only"],
+        no_m3u_for_playlists=args.no_m3u or flags["no_m3u"],
         quality_fallback=not args.no_fallback, 
-        cover_og_quality=args.og_cover or config.getboolean("DEFAULT", "og_cover"),
-        no_cover=args.no_cover or config.getboolean("DEFAULT", "no_cover"),
+        cover_og_quality=args.og_cover or flags["og_cover"],
+        no_cover=args.no_cover or flags["no_cover"],
         downloads_db=None if args.no_db else QOBUZ_DB,
         folder_format=args.folder_format or d["folder_format"],
         track_format=args.track_format or d["track_format"],
-        smart_discography=args.smart_discography or config.getboolean("DEFAULT", "smart_discography"),
+        smart_discography=args.smart_discography or flags["smart_discography"],
+        url_workers=args.url_workers,
+        parallel_chunks=args.parallel_chunks,
+        meta_cache_file=META_CACHE,
     )
 
     try:
@@ -151,9 +223,17 @@ def main():
         )
         # 直接下载
         qobuz.download_list_of_urls(args.urls)
+    except (InvalidAppIdError, InvalidAppSecretError):
+        # 缓存的 App ID/密钥已失效，删除缓存以免重置配置时再次用到
+        try:
+            os.remove(BUNDLE_CACHE)
+        except OSError: pass
+        raise
     except KeyboardInterrupt:
         console.print("\n[red]用户强制停止。[/]")
     finally:
+        qobuz.close_db()
+        qobuz.save_meta_cache()
         _remove_leftovers(qobuz.directory)
 
 
@@ -1,7 +1,7 @@
 import argparse
 
 def qobuz_dl_args(
-    default_quality=6, default_limit=20, default_folder="Qobuz Downloads"
+    default_quality=6, default_limit=20, default_folder="Qobuz Downloads", default_url_workers=4
 ):
     parser = argparse.ArgumentParser(
         prog="qd",
@@ -46,5 +46,13 @@ def qobuz_dl_args(
     parser.add_argument("-ff", "--folder-format", metavar="FMT", help="自定义文件夹命名格式")
     parser.add_argument("-tf", "--track-format", metavar="FMT", help="自定义文件名命名格式")
     parser.add_argument("-s", "--smart-discography", action="store_true", help="智能筛选 (下载艺人时过滤重复/杂乱专辑)")
+    parser.add_argument("--parallel-chunks", action="store_true", help="大文件 (>32MB) 分 4 段并发下载 (仅 Linux/macOS)")
+    parser.add_argument(
+        "-w", "--url-workers",
+        metavar="int",
+        type=int,
+        default=default_url_workers,
+        help=f"同时处理的链接数量 (默认: {default_url_workers})"
+    )
 
     return parser
@@ -1,26 +1,46 @@
 import logging
 import os
 import re
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
-from bs4 import BeautifulSoup as bso
-from pathvalidate import sanitize_filename
 
-from qobuz_dl import downloader, qopy
+from qobuz_dl import downloader, meta_cache, qopy
 from qobuz_dl.bundle import Bundle
 from qobuz_dl.color import RED, YELLOW, OFF
-from qobuz_dl.exceptions import NonStreamable
-from qobuz_dl.db import create_db, handle_download_id
+from qobuz_dl.exceptions import DownloadCancelled, NonStreamable
+from qobuz_dl.session import SESSION
+from qobuz_dl.db import DownloadsDB
 from qobuz_dl.utils import (
-    get_url_info, make_m3u, smart_discography_filter, create_and_return_dir
+    get_url_info, make_m3u, smart_discography_filter, create_and_return_dir, fast_sanitize
 )
 from rich.console import Console
 console = Console()
 logger = logging.getLogger(__name__)
 
+# 无嵌套量词，回溯有上界；可选的 slug 段兼容 www.qobuz.com/us-en/album/{name}/{id}
+_QOBUZ_URL_RE = re.compile(
+    r"https?://(?:open|play|www)\.qobuz\.com(?:/[a-z]{2}-[a-z]{2})?"
+    r"/(?:album|artist|track|playlist|label)(?:/[\w-]+)?/[a-zA-Z0-9]+",
+    re.ASCII,
+)
+
+
+def _is_lastfm(url):
+    host = urlsplit(url).netloc.lower()
+    return host == "last.fm" or host.endswith(".last.fm")
+
+
+# last.fm 歌单页面选择器
+ARTISTS_SELECTOR = "td.chartlist-artist > a"
+TITLE_SELECTOR = "td.chartlist-name > a"
+
 QUALITIES = {5: "5 - MP3", 6: "6 - 16 bit, 44.1kHz", 7: "7 - 24 bit, <96kHz", 27: "27 - 24 bit, >96kHz"}
 
 class QobuzDL:
-    def __init__(self, directory="Qobuz Downloads", quality=6, embed_art=False, ignore_singles_eps=False, no_m3u_for_playlists=False, quality_fallback=True, cover_og_quality=False, no_cover=False, downloads_db=None, folder_format="{artist} - {album} ({year})", track_format="{tracknumber}. {tracktitle}", smart_discography=False):
+    def __init__(self, directory="Qobuz Downloads", quality=6, embed_art=False, ignore_singles_eps=False, no_m3u_for_playlists=False, quality_fallback=True, cover_og_quality=False, no_cover=False, downloads_db=None, folder_format="{artist} - {album} ({year})", track_format="{tracknumber}. {tracktitle}", smart_discography=False, url_workers=4, parallel_chunks=False, meta_cache_file=None):
         self.directory = create_and_return_dir(directory)
         self.quality = quality
         self.embed_art = embed_art
@@ -29,28 +49,45 @@ class QobuzDL:
         self.quality_fallback = quality_fallback
         self.cover_og_quality = cover_og_quality
         self.no_cover = no_cover
-        self.downloads_db = create_db(downloads_db) if downloads_db else None
+        self.downloads_db = DownloadsDB(downloads_db) if downloads_db else None
         self.folder_format = folder_format
         self.track_format = track_format
         self.smart_discography = smart_discography
+        self.url_workers = max(1, int(url_workers))
+        self.parallel_chunks = parallel_chunks
+        self.meta_cache_file = meta_cache_file
+        self._meta_cache_ts = None
+        self._meta_cache_ids = set()
+        # 所有 Download 实例共享，Ctrl-C 时一次性通知并发处理中的全部链接
+        self._shutdown = threading.Event()
 
     def initialize_client(self, email, pwd, app_id, secrets, use_token, user_id, user_auth_token):
-        self.client = qopy.Client(email, pwd, app_id, secrets, use_token, user_id, user_auth_token)
+        cached = meta_cache.load(self.meta_cache_file) if self.meta_cache_file else None
+        if cached:
+            self._meta_cache_ts, album_meta = cached
+            self._meta_cache_ids = set(album_meta)
+        else:
+            album_meta = None
+        self.client = qopy.Client(
+            email, pwd, app_id, secrets, use_token, user_id, user_auth_token,
+            session=SESSION, album_meta=album_meta
+        )
         console.print(f"[dim]设定最高画质: {QUALITIES[int(self.quality)]}[/dim]\n")
 
     def download_from_id(self, item_id, album=True, alt_path=None):
-        # 移除数据库存在即返回的逻辑，仅在下载成功后记录
-        if handle_download_id(self.downloads_db, item_id, add_id=False):
-            pass # 继续尝试下载，让 downloader 检测本地文件
-
+        # 不因数据库中已有记录而跳过，让 downloader 检测本地文件；仅在下载成功后记录
         try:
             dloader = downloader.Download(
                 self.client, item_id, alt_path or self.directory, int(self.quality),
                 self.embed_art, self.ignore_singles_eps, self.quality_fallback,
-                self.cover_og_quality, self.no_cover, self.folder_format, self.track_format
+                self.cover_og_quality, self.no_cover, self.folder_format, self.track_format,
+                parallel_chunks=self.parallel_chunks, shutdown=self._shutdown
             )
-            dloader.download_id_by_type(not album)
-            handle_download_id(self.downloads_db, item_id, add_id=True)
+            # 只有全部曲目成功才记录，失败或部分失败的项目下次仍会重试
+            if dloader.download_id_by_type(not album) and self.downloads_db:
+                self.downloads_db.add_id(item_id)
+        except DownloadCancelled:
+            return
         except (requests.exceptions.RequestException, NonStreamable) as e:
             console.print(f"[red]获取资源出错: {e}[/red]")
 
@@ -67,62 +104,163 @@ class QobuzDL:
             type_dict = possibles[url_type]
         except (KeyError, IndexError, TypeError): return
 
-        if type_dict.get("func"):
-            try:
-                content = [item for item in type_dict["func"](item_id)]
-                if not content:
-                    console.print("[red]未找到内容[/red]")
-                    return
-                content_name = content[0]["name"]
-                console.print(f"[bold yellow]正在获取 {url_type}: {content_name}[/]")
-                new_path = create_and_return_dir(os.path.join(self.directory, sanitize_filename(content_name)))
-
-                if self.smart_discography and url_type == "artist":
-                    items = smart_discography_filter(content, save_space=True, skip_extras=True)
-                else:
-                    items = [item[type_dict["iterable_key"]]["items"] for item in content][0]
-
-                console.print(f"[yellow]包含 {len(items)} 个项目，准备并发下载...[/]")
-                dloader = downloader.Download(
-                    self.client, item_id, new_path, int(self.quality), self.embed_art,
-                    self.ignore_singles_eps, self.quality_fallback, self.cover_og_quality,
-                    self.no_cover, self.folder_format, self.track_format
-                )
-                dloader.download_batch(items, content_name=content_name)
-                if url_type == "playlist" and not self.no_m3u_for_playlists:
-                    console.print("[dim]正在生成 .m3u 播放列表文件...[/dim]")
-                    make_m3u(new_path)
-            except Exception as e: console.print(f"[red]处理批量内容出错: {e}[/red]")
-        else:
+        if not type_dict.get("func"):
             self.download_from_id(item_id, type_dict["album"])
+            return
+
+        try:
+            content = list(type_dict["func"](item_id))
+            if not content:
+                console.print("[red]未找到内容[/red]")
+                return
+            content_name = content[0]["name"]
+        except (requests.exceptions.RequestException, KeyError, IndexError) as e:
+            console.print(f"[red]获取 {url_type} 元数据出错: {e}[/red]")
+            return
+
+        console.print(f"[bold yellow]正在获取 {url_type}: {content_name}[/]")
+        new_path = create_and_return_dir(os.path.join(self.directory, fast_sanitize(content_name)))
+
+        if self.smart_discography and url_type == "artist":
+            items = smart_discography_filter(content, save_space=True, skip_extras=True)
+        else:
+            items = content[0][type_dict["iterable_key"]]["items"]
+
+        # 歌单需要完整的目录与 .m3u，已在别处下载过的曲目仍要放进该歌单目录
+        if self.downloads_db and url_type != "playlist":
+            total = len(items)
+            items = [it for it in items if it.get("id") not in self.downloads_db]
+            if len(items) < total:
+                console.print(f"[dim]已跳过 {total - len(items)} 个已下载项目 (使用 --no-db 强制重新下载)[/dim]")
+            if not items:
+                console.print(f"[green]{content_name} 的所有项目均已下载[/]")
+                return
+
+        console.print(f"[yellow]包含 {len(items)} 个项目，准备并发下载...[/]")
+        dloader = downloader.Download(
+            self.client, item_id, new_path, int(self.quality), self.embed_art,
+            self.ignore_singles_eps, self.quality_fallback, self.cover_og_quality,
+            self.no_cover, self.folder_format, self.track_format,
+            downloads_db=self.downloads_db, parallel_chunks=self.parallel_chunks,
+            shutdown=self._shutdown
+        )
+        # 单个项目的失败由 download_batch 内部记录，不会中断其余项目
+        try:
+            dloader.download_batch(items, content_name=content_name)
+        except DownloadCancelled:
+            return
+        except Exception as e:
+            console.print(f"[red]处理批量内容出错: {e}[/red]")
+
+        if url_type == "playlist" and not self.no_m3u_for_playlists:
+            console.print("[dim]正在生成 .m3u 播放列表文件...[/dim]")
+            make_m3u(new_path)
 
     def download_list_of_urls(self, raw_args):
         if not raw_args: return
-        valid_urls = []
-        full_text = " ".join(raw_args)
-        qobuz_pattern = r"(https?://(?:open|play|www)\.qobuz\.com(?:/[a-zA-Z0-9_-]+)*/(?:album|artist|track|playlist|label)/[a-zA-Z0-9]+)"
-        extracted = re.findall(qobuz_pattern, full_text)
-        if extracted: valid_urls.extend(extracted)
-        
-        if not valid_urls:
-            for u in raw_args:
-                if os.path.isfile(u): self.download_from_txt_file(u)
-                elif "last.fm" in u: self.download_lastfm_pl(u)
-
-        if not valid_urls and not any(os.path.isfile(x) or "last.fm" in x for x in raw_args):
+        # 单次遍历：按类型归类每个参数
+        urls, files, lastfm, other = [], [], [], []
+        for u in raw_args:
+            if _QOBUZ_URL_RE.fullmatch(u): urls.append(u)
+            elif _is_lastfm(u): lastfm.append(u)
+            elif os.path.isfile(u): files.append(u)
+            else: other.append(u)
+        # 兼容直接粘贴的整段文字 (或带多余参数的链接)
+        if other:
+            urls.extend(_QOBUZ_URL_RE.findall(" ".join(other)))
+
+        if not (urls or files or lastfm):
             console.print(f"[bold red]未检测到有效的 Qobuz 链接！[/]")
             return
 
-        unique_urls = list(set(valid_urls))
-        console.print(f"[green]识别到 {len(unique_urls)} 个链接，开始处理...[/]")
-        for url in unique_urls: self.handle_url(url)
+        if urls:
+            unique_urls = list(dict.fromkeys(urls))
+            console.print(f"[green]识别到 {len(unique_urls)} 个链接，开始处理...[/]")
+            self._handle_urls(unique_urls)
+        for txt_file in files: self.download_from_txt_file(txt_file)
+        for playlist_url in lastfm: self.download_lastfm_pl(playlist_url)
+        self.flush_db()
+
+    def _handle_urls(self, unique_urls):
+        if len(unique_urls) == 1 or self.url_workers == 1:
+            for url in unique_urls: self.handle_url(url)
+            return
+
+        # 链接级别并发：重叠多个专辑/艺人/歌单的元数据请求与下载
+        with ThreadPoolExecutor(max_workers=self.url_workers) as executor:
+            futures = {executor.submit(self.handle_url, url): url for url in unique_urls}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        console.print(f"[red]处理链接出错 {futures[future]}: {e}[/red]")
+            except KeyboardInterrupt:
+                # 取消尚未开始的链接，通知进行中的下载退出；退出 with 时等待它们结束
+                self._shutdown.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def flush_db(self):
+        if self.downloads_db:
+            self.downloads_db.flush()
+
+    def close_db(self):
+        if self.downloads_db:
+            self.downloads_db.close()
+
+    def save_meta_cache(self):
+        client = getattr(self, "client", None)
+        if not (self.meta_cache_file and client):
+            return
+        albums = client.album_meta_snapshot()
+        # 本次运行没有请求新的专辑 (如只下载单曲) 时不重写缓存文件
+        if albums.keys() - self._meta_cache_ids:
+            meta_cache.save(self.meta_cache_file, albums, self._meta_cache_ts)
 
     def download_from_txt_file(self, txt_file):
         with open(txt_file, "r") as txt:
-            urls = [l.strip() for l in txt.readlines() if not l.strip().startswith("#")]
+            urls = [l.strip() for l in txt if l.strip() and not l.lstrip().startswith("#")]
             self.download_list_of_urls(urls)
 
     def download_lastfm_pl(self, playlist_url):
+        # bs4 仅在此处使用，延迟导入以加快 CLI 启动
+        from bs4 import BeautifulSoup as bso, FeatureNotFound
+
+        # last.fm 没有歌单 API，只能解析网页
+        try:
+            r = SESSION.get(playlist_url, timeout=10)
+            r.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            console.print(f"[red]获取 last.fm 歌单失败: {e}[/red]")
+            return
+
         try:
-            r = requests.get(playlist_url, timeout=10)
-        except: pass
\ No newline at end of file
+            soup = bso(r.content, "lxml")
+        except FeatureNotFound:
+            soup = bso(r.content, "html.parser")
+        artists = [a.text.strip() for a in soup.select(ARTISTS_SELECTOR)]
+        titles = [t.text.strip() for t in soup.select(TITLE_SELECTOR)]
+        if not artists or len(artists) != len(titles):
+            console.print("[red]未找到内容[/red]")
+            return
+
+        heading = soup.select_one("h1")
+        pl_title = fast_sanitize(heading.text.strip() if heading else "last.fm")
+        pl_directory = create_and_return_dir(os.path.join(self.directory, pl_title))
+        console.print(f"[bold yellow]正在获取 last.fm 歌单: {pl_title} ({len(titles)} 首)[/]")
+
+        for artist, title in zip(artists, titles):
+            try:
+                found = self.client.search_tracks(f"{artist} {title}")["tracks"]["items"]
+            except (requests.exceptions.RequestException, KeyError) as e:
+                console.print(f"[red]搜索失败 {artist} - {title}: {e}[/red]")
+                continue
+            if not found:
+                console.print(f"[dim]Qobuz 上未找到: {artist} - {title}[/dim]")
+                continue
+            self.download_from_id(found[0]["id"], False, pl_directory)
+
+        if not self.no_m3u_for_playlists:
+            make_m3u(pl_directory)
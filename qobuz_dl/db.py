@@ -1,39 +1,76 @@
 import logging
 import sqlite3
+import threading
 
 from qobuz_dl.color import YELLOW, RED
 
 logger = logging.getLogger(__name__)
 
 
-def create_db(db_path):
-    with sqlite3.connect(db_path) as conn:
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-20000;
+"""
+
+
+def _connect(db_path, **kwargs):
+    conn = sqlite3.connect(db_path, **kwargs)
+    # Single writer, append-mostly table: WAL + synchronous=NORMAL skips the fsync per commit
+    conn.executescript(_PRAGMAS)
+    return conn
+
+
+# Thread-safe wrapper: known IDs live in memory, new ones are written by flush() in one transaction
+class DownloadsDB:
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.pending = set()
+        self._lock = threading.Lock()
+        # One connection for the whole run keeps the WAL and page cache warm;
+        # every access holds self._lock, so it is safe to share across threads
+        self._conn = _connect(self.db_path, check_same_thread=False)
         try:
-            conn.execute("CREATE TABLE downloads (id TEXT UNIQUE NOT NULL);")
+            with self._conn:
+                self._conn.execute("CREATE TABLE downloads (id TEXT UNIQUE NOT NULL);")
             logger.info(f"{YELLOW}Download-IDs database created")
         except sqlite3.OperationalError:
             pass
-        return db_path
+        self._ids = {row[0] for row in self._conn.execute("SELECT id FROM downloads")}
 
+    def __contains__(self, item_id):
+        # Track IDs are ints in the API but stored as strings
+        item_id = str(item_id)
+        with self._lock:
+            return item_id in self._ids
 
-def handle_download_id(db_path, item_id, add_id=False):
-    if not db_path:
-        return
+    def add_id(self, item_id):
+        item_id = str(item_id)
+        with self._lock:
+            if item_id not in self._ids:
+                self._ids.add(item_id)
+                self.pending.add(item_id)
 
-    with sqlite3.connect(db_path) as conn:
-        # If add_if is False return a string to know if the ID is in the DB
-        # Otherwise just add the ID to the DB
-        if add_id:
+    def flush(self):
+        with self._lock:
+            if not self.pending or self._conn is None:
+                return
             try:
-                conn.execute(
-                    "INSERT INTO downloads (id) VALUES (?)",
-                    (item_id,),
-                )
-                conn.commit()
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO downloads (id) VALUES (?)",
+                        [(i,) for i in self.pending],
+                    )
+                self.pending = set()
             except sqlite3.Error as e:
                 logger.error(f"{RED}Unexpected DB error: {e}")
-        else:
-            return conn.execute(
-                "SELECT id FROM downloads where id=?",
-                (item_id,),
-            ).fetchone()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,11 +1,20 @@
 import logging
 import os
+import queue
+import secrets
+import shutil
+import threading
 import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from string import Formatter
 from typing import Tuple
 from collections import Counter # 新增：用于统计歌手频率
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError, SSLError
+from urllib3.util.retry import Retry
 from pathvalidate import sanitize_filename, sanitize_filepath
 from rich.progress import (
     Progress,
@@ -19,7 +28,8 @@ from rich.progress import (
 from rich.console import Console
 
 import qobuz_dl.metadata as metadata
-from qobuz_dl.exceptions import NonStreamable
+from qobuz_dl.exceptions import DownloadCancelled, NonStreamable
+from qobuz_dl.session import new_session
 
 # --- 补回 cli.py 需要的变量 ---
 DEFAULT_FOLDER = "{artist} - {album} ({year})"
@@ -28,6 +38,27 @@ DEFAULT_TRACK = "{artist} - {tracktitle} [{bit_depth}B-{sampling_rate}kHz]"
 
 QL_DOWNGRADE = "FormatRestrictedByFormatAvailability"
 MAX_WORKERS = 10 
+# 每次从网络读取的块大小，以及进度条刷新的最小间隔 (秒)
+COPY_BUFSIZE = 1 << 20
+PROGRESS_INTERVAL = 0.25
+# 建立连接、读取响应头的重试交给 urllib3，退避很短 (urllib3 内部用 time.sleep，Ctrl-C 无法打断)
+DOWNLOAD_RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    allowed_methods=["GET", "HEAD"],
+    raise_on_status=False,
+)
+# 502/503/504 由 _download_and_tag 以可取消的 _shutdown.wait 退避后整体重试
+RETRY_STATUS = (502, 503, 504)
+# urllib3 无法重试已开始传输的响应体，这些错误仍由 _download_and_tag 整体重试
+# 响应体直接从 response.raw 读取，抛出的是 urllib3 原始异常 (含传输中途的 TLS 错误)
+STREAM_ERRORS = (ProtocolError, ReadTimeoutError, SSLError)
+
+# --parallel-chunks：大于此大小的文件拆成 RANGE_PARTS 段并发下载 (需要 os.pwrite，Windows 下自动退回串行)
+RANGE_MIN_SIZE = 32 << 20
+RANGE_PARTS = 4
+# Artist 模式下每张专辑内部同时下载的曲目数 (独立线程池，避免占满外层线程池而死锁)
+ALBUM_TRACK_WORKERS = 4
 
 console = Console()
 
@@ -38,6 +69,88 @@ DEFAULT_FORMATS = {
 
 logger = logging.getLogger(__name__)
 
+# Rich 同一时间只允许一个 Live 显示 (进度条/状态动画)
+# 并发处理多个链接时，拿不到锁的批次不显示进度，静默下载
+_LIVE_LOCK = threading.Lock()
+
+
+@contextmanager
+def _live_progress():
+    owner = _LIVE_LOCK.acquire(blocking=False)
+    progress = Progress(
+        TextColumn("{task.description}", justify="left"),
+        BarColumn(bar_width=15),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+        # 默认每秒重绘 10 次且持有 Console 锁；与 PROGRESS_INTERVAL 的进度上报频率对齐
+        refresh_per_second=4,
+        disable=not owner,
+    )
+    try:
+        with progress:
+            yield progress
+    finally:
+        if owner:
+            _LIVE_LOCK.release()
+
+
+@contextmanager
+def _live_status(message):
+    owner = _LIVE_LOCK.acquire(blocking=False)
+    try:
+        with (console.status(message, spinner="dots") if owner else nullcontext()):
+            yield
+    finally:
+        if owner:
+            _LIVE_LOCK.release()
+
+
+# 包装文件对象：写入的字节数限频上报到 Rich 进度条；cancel 被设置时在下次上报抛出 DownloadCancelled
+class _ProgressWriter:
+
+    def __init__(self, file, progress, task_id, interval=PROGRESS_INTERVAL, cancel=None):
+        self._file = file
+        self._progress = progress
+        self._task_id = task_id
+        self._interval = interval
+        self._cancel = cancel
+        self._pending = 0
+        self._last = time.monotonic()
+
+    def write(self, data):
+        self._file.write(data)
+        self._pending += len(data)
+        now = time.monotonic()
+        if now - self._last >= self._interval:
+            self.flush_progress()
+            self._last = now
+            if self._cancel is not None and self._cancel.is_set():
+                raise DownloadCancelled("下载已取消")
+
+    def flush_progress(self):
+        if self._pending:
+            self._progress.advance(self._task_id, self._pending)
+            self._pending = 0
+
+
+# 最简文件对象：从 offset 起用 os.pwrite 顺序写入，多个分段可并发写同一个文件
+class _PositionalFile:
+
+    def __init__(self, fd, offset):
+        self._fd = fd
+        self.offset = offset
+
+    def write(self, data):
+        while data:
+            n = os.pwrite(self._fd, data, self.offset)
+            self.offset += n
+            data = data[n:]
+
+
 class Download:
     def __init__(
         self,
@@ -52,6 +165,9 @@ class Download:
         no_cover: bool = False,
         folder_format=None,
         track_format=None,
+        downloads_db=None,
+        parallel_chunks: bool = False,
+        shutdown=None,
     ):
         self.client = client
         self.item_id = item_id
@@ -62,36 +178,63 @@ class Download:
         self.downgrade_quality = downgrade_quality
         self.cover_og_quality = cover_og_quality
         self.no_cover = no_cover
-        
+        # 批量下载时记录已完成的专辑/曲目 ID (qobuz_dl.db.DownloadsDB)
+        self.downloads_db = downloads_db
+        self.parallel_chunks = parallel_chunks and hasattr(os, "pwrite")
+        # 同一批次的音频/封面请求复用连接
+        # Artist 模式最多 MAX_WORKERS 张专辑 x ALBUM_TRACK_WORKERS 首曲目同时下载
+        pool_maxsize = MAX_WORKERS * ALBUM_TRACK_WORKERS * (RANGE_PARTS if self.parallel_chunks else 1)
+        self.session = new_session(
+            pool_connections=MAX_WORKERS * 2, pool_maxsize=pool_maxsize, max_retries=DOWNLOAD_RETRY
+        )
+        # 封面按 URL 记录第一次保存的本地路径：歌单中同一专辑的多首曲目只下载一次，之后从磁盘复制
+        self._cover_cache = {}
+        self._cover_locks = {}
+        self._cover_lock = threading.Lock()
+        # _get_format 为判断画质已请求过首曲的下载链接，下载该曲时直接复用
+        self._prefetched_url = {}
+        # Ctrl-C 时被设置：重试等待立即结束，下载循环与待处理任务随即退出 (可由调用方跨实例共享)
+        self._shutdown = shutdown or threading.Event()
+
         self.fmt_album = "{tracknumber} {artist} - {tracktitle} [{bit_depth}B-{sampling_rate}kHz]"
         self.fmt_single = "{artist} - {tracktitle} [{bit_depth}B-{sampling_rate}kHz]"
         self.folder_format = folder_format or DEFAULT_FOLDER
 
     def download_id_by_type(self, track=True):
-        if not track:
-            self.download_release()
-        else:
-            self.download_track()
+        # 返回是否全部下载成功，调用方据此决定是否写入下载记录
+        try:
+            if not track:
+                return self.download_release()
+            return self.download_track()
+        finally:
+            self.session.close()
 
-    def _process_single_track(self, i, count, total_items, meta, dirn, is_multiple, progress, overall_task_id, failed_list, ind_cover, track_fmt):
+    def _process_single_track(self, i, count, total_items, meta, dirn, disc_dirs, progress, overall_task_id, failed_list, ind_cover, track_fmt, task_slots):
         display_name = f"({count}/{total_items}) {i.get('title', 'Unknown')}"[:25]
-        
-        task_id = progress.add_task(f"[cyan]等待中...[/] {display_name}", filename=display_name, start=False, visible=True)
-        
+
+        # 从预分配的进度行中取一行复用，而不是每项 add_task/remove_task
+        task_id = task_slots.get()
+        progress.reset(task_id, start=False, total=None, description=f"[cyan]等待中...[/] {display_name}", visible=True, filename=display_name)
+
         try:
             # 判断是否为专辑 (Artist模式下 i 是专辑信息)
             if "tracks_count" in i and "track_number" not in i:
-                self._process_album_batch(i, count, total_items, dirn, progress, task_id, failed_list)
+                done = self._process_album_batch(i, count, total_items, dirn, progress, task_id, failed_list)
             else:
-                self._process_real_track(i, count, total_items, meta, dirn, is_multiple, progress, task_id, ind_cover, track_fmt, failed_list)
+                done = self._process_real_track(i, count, total_items, meta, dirn, disc_dirs, progress, task_id, ind_cover, track_fmt, failed_list)
+            if done and self.downloads_db is not None and "id" in i:
+                self.downloads_db.add_id(i["id"])
 
+        except DownloadCancelled:
+            pass
         except Exception as e:
             error_msg = f"{display_name} - {str(e)}"
             failed_list.append(error_msg)
             progress.console.print(f"[red]出错 {display_name}: {e}[/red]")
         finally:
             progress.update(overall_task_id, advance=1)
-            progress.remove_task(task_id)
+            progress.update(task_id, visible=False)
+            task_slots.put(task_id)
 
     # 专门处理 Artist 下载时的单个专辑逻辑
     def _process_album_batch(self, album_simple_meta, album_idx, total_albums, base_dir, progress, task_id, failed_list):
@@ -117,38 +260,62 @@ class Download:
 
             # 3. 下载封面
             if not self.no_cover:
-                _get_extra(meta["image"]["large"], album_dir, "cover.jpg", og_quality=self.cover_og_quality)
+                _get_extra(meta["image"]["large"], album_dir, "cover.jpg", og_quality=self.cover_og_quality, session=self.session)
 
             # 4. 遍历下载曲目
             tracks = meta["tracks"]["items"]
+            disc_dirs = _make_disc_dirs(album_dir, tracks)
+            tracks = self._skip_existing_tracks(album_dir, tracks, disc_dirs)
             total_tracks = len(tracks)
-            is_multiple = len({t.get("media_number", 1) for t in tracks}) > 1
-            
-            for idx, track in enumerate(tracks):
-                track_title = track.get('title', 'Unknown')
-                
-                # UI: (专辑序号/总专数) 专辑名 (曲目序号/总曲数)
-                short_album_name = album_title[:15].strip() 
-                display_desc = f"({album_idx}/{total_albums}) {short_album_name} ({idx+1}/{total_tracks})"
-                progress.update(task_id, description=display_desc)
-                
+            all_done = True
+            short_album_name = album_title[:15].strip()
+            is_mp3 = True if int(self.quality) == 5 else False
+
+            def download_one(track):
+                if self._shutdown.is_set():
+                    raise DownloadCancelled("下载已取消")
+                # 复用本专辑预分配的曲目进度行，而不是每首 add_task/remove_task
+                track_task = track_slots.get()
+                progress.reset(track_task, start=False, total=None, description=f"  ↳ {track.get('title', 'Unknown')[:20]}", visible=True)
                 try:
-                    parse = self.client.get_track_url(track["id"], fmt_id=self.quality)
+                    parse = self._get_track_url(track["id"])
                     if "sample" not in parse and parse["sampling_rate"]:
-                        is_mp3 = True if int(self.quality) == 5 else False
                         self._download_and_tag(
-                            album_dir, idx + 1, parse, track, meta,
-                            False, is_mp3, track.get("media_number") if is_multiple else None,
-                            progress, task_id, ind_cover=False, track_fmt=self.fmt_album
+                            album_dir, parse, track, meta,
+                            False, is_mp3, _disc_dir(disc_dirs, track),
+                            progress, track_task, ind_cover=False, track_fmt=self.fmt_album
                         )
-                except Exception as e:
-                    failed_list.append(f"专辑 [{album_title_raw}] - {track_title}: {e}")
+                finally:
+                    progress.update(track_task, visible=False)
+                    track_slots.put(track_task)
+
+            # UI: (专辑序号/总专数) 专辑名 (已完成曲目/总曲数)
+            progress.update(task_id, description=f"({album_idx}/{total_albums}) {short_album_name} (0/{total_tracks})", total=total_tracks)
+            track_slots = queue.Queue()
+            for _ in range(min(ALBUM_TRACK_WORKERS, total_tracks)):
+                track_slots.put(progress.add_task("", filename="", start=False, visible=False))
+            try:
+                with ThreadPoolExecutor(max_workers=ALBUM_TRACK_WORKERS) as executor:
+                    futures = {executor.submit(download_one, track): track for track in tracks}
+                    for finished, future in enumerate(as_completed(futures), 1):
+                        progress.update(task_id, completed=finished, description=f"({album_idx}/{total_albums}) {short_album_name} ({finished}/{total_tracks})")
+                        try:
+                            future.result()
+                        except DownloadCancelled:
+                            all_done = False
+                        except Exception as e:
+                            all_done = False
+                            failed_list.append(f"专辑 [{album_title_raw}] - {futures[future].get('title', 'Unknown')}: {e}")
+            finally:
+                while not track_slots.empty():
+                    progress.remove_task(track_slots.get())
 
         except Exception as e:
             raise Exception(f"专辑处理失败: {e}")
+        return all_done
 
     # 原有的单曲处理逻辑
-    def _process_real_track(self, i, count, total_items, meta, dirn, is_multiple, progress, task_id, ind_cover, track_fmt, failed_list):
+    def _process_real_track(self, i, count, total_items, meta, dirn, disc_dirs, progress, task_id, ind_cover, track_fmt, failed_list):
         track_meta = i
         album_meta = meta if meta else i.get('album', i)
         title = i.get('title', 'Unknown')
@@ -157,22 +324,23 @@ class Download:
         progress.update(task_id, description=display_desc)
         
         try:
-            parse = self.client.get_track_url(i["id"], fmt_id=self.quality)
+            parse = self._get_track_url(i["id"])
         except Exception as e:
             raise Exception(f"获取链接失败: {e}")
 
         if "sample" not in parse and parse["sampling_rate"]:
             is_mp3 = True if int(self.quality) == 5 else False
             self._download_and_tag(
-                dirn, count, parse, track_meta, album_meta,
-                False, is_mp3, i.get("media_number") if is_multiple else None,
+                dirn, parse, track_meta, album_meta,
+                False, is_mp3, _disc_dir(disc_dirs, i),
                 progress, task_id, ind_cover=ind_cover, track_fmt=track_fmt
             )
-        else:
-            progress.console.print(f"[yellow]跳过试听片段: {title}[/]")
+            return True
+        progress.console.print(f"[yellow]跳过试听片段: {title}[/]")
+        return False
 
     def download_release(self):
-        with console.status("[bold green]正在获取元数据...", spinner="dots"):
+        with _live_status("[bold green]正在获取元数据..."):
             meta = self.client.get_album_meta(self.item_id)
         if not meta.get("streamable"): raise NonStreamable("无法串流")
 
@@ -186,12 +354,19 @@ class Download:
         os.makedirs(dirn, exist_ok=True)
 
         if not self.no_cover:
-            _get_extra(meta["image"]["large"], dirn, "cover.jpg", og_quality=self.cover_og_quality)
+            _get_extra(meta["image"]["large"], dirn, "cover.jpg", og_quality=self.cover_og_quality, session=self.session)
 
         tracks = meta["tracks"]["items"]
-        is_multiple = len({t.get("media_number", 1) for t in tracks}) > 1
-        self._run_multithreaded_download(tracks, dirn, meta, is_multiple, ind_cover=False, track_fmt=self.fmt_album)
+        # 多碟专辑的 Disc N 目录在分发给工作线程前一次性创建
+        disc_dirs = _make_disc_dirs(dirn, tracks)
+        remaining = self._skip_existing_tracks(dirn, tracks, disc_dirs)
+        if len(remaining) < len(tracks):
+            console.print(f"[dim]本地已存在 {len(tracks) - len(remaining)} 首，跳过[/dim]")
+        all_done = True
+        if remaining:
+            all_done = self._run_multithreaded_download(remaining, dirn, meta, disc_dirs, ind_cover=False, track_fmt=self.fmt_album)
         console.print(f"[bold green]✔ 专辑流程结束: {album_title}[/]")
+        return all_done
 
     # 修改：增加了智能艺人过滤器
     def download_batch(self, track_list, content_name="歌单"):
@@ -200,186 +375,316 @@ class Download:
         # --- 智能过滤核心逻辑 ---
         # 1. 检查这是否是一个包含专辑的列表 (Artist/Label)，而不是歌单 (Playlist)
         if track_list and "tracks_count" in track_list[0] and "artist" in track_list[0]:
-            # 2. 统计出现频率最高的艺人名
-            artists = [item['artist']['name'] for item in track_list if 'artist' in item]
-            if artists:
-                most_common = Counter(artists).most_common(1)
-                if most_common:
-                    main_artist, count = most_common[0]
-                    # 3. 如果某个艺人占比超过 40%，我们假设这是由于下载该艺人触发的
-                    if count / len(track_list) > 0.4:
-                        console.print(f"[bold yellow]检测到主艺人: {main_artist}，正在过滤无关专辑...[/]")
-                        
-                        filtered_items = []
-                        for item in track_list:
-                            item_artist = item.get('artist', {}).get('name', '')
-                            # 保留条件：
-                            # 1. 专辑艺人包含主艺人名 (例如 "Billie Eilish", "Billie Eilish & Khalid")
-                            # 2. 或者是 Various Artists (精选集/原声带)
-                            if (main_artist.lower() in item_artist.lower()) or \
-                               (item_artist.lower() in main_artist.lower()) or \
-                               "various" in item_artist.lower():
-                                filtered_items.append(item)
-                            else:
-                                console.print(f"[dim]已剔除无关专辑: {item_artist} - {item['title']}[/dim]")
-                        
-                        final_list = filtered_items
-                        console.print(f"[green]过滤完成: {len(track_list)} -> {len(final_list)} 张专辑[/]")
-
-        self._run_multithreaded_download(final_list, self.path, None, False, ind_cover=True, track_fmt=self.fmt_single)
+            # 2. 一次遍历用多数投票 (Boyer-Moore) 选出候选主艺人，同时缓存小写名，过滤时不再重复计算
+            candidate, votes = None, 0
+            names, lowered = [], []
+            for item in track_list:
+                name = item.get('artist', {}).get('name', '')
+                if 'artist' in item:
+                    names.append(name)
+                    if votes == 0:
+                        candidate, votes = name, 1
+                    elif name == candidate:
+                        votes += 1
+                    else:
+                        votes -= 1
+                lowered.append(name.lower())
+            if candidate is not None:
+                main_artist = candidate
+                count = names.count(candidate)
+                # 投票只保证过半数的艺人胜出；候选未过半时，40%~50% 的主艺人需精确统计
+                if count * 2 <= len(names):
+                    main_artist, count = Counter(names).most_common(1)[0]
+                # 3. 如果某个艺人占比超过 40%，我们假设这是由于下载该艺人触发的
+                if count / len(track_list) > 0.4:
+                    console.print(f"[bold yellow]检测到主艺人: {main_artist}，正在过滤无关专辑...[/]")
+                    main_lower = main_artist.lower()
+
+                    filtered_items = []
+                    for item, item_lower in zip(track_list, lowered):
+                        # 保留条件：
+                        # 1. 专辑艺人包含主艺人名 (例如 "Billie Eilish", "Billie Eilish & Khalid")
+                        # 2. 或者是 Various Artists (精选集/原声带)
+                        if main_lower in item_lower or item_lower in main_lower or "various" in item_lower:
+                            filtered_items.append(item)
+                        else:
+                            console.print(f"[dim]已剔除无关专辑: {item.get('artist', {}).get('name', '')} - {item['title']}[/dim]")
+
+                    final_list = filtered_items
+                    console.print(f"[green]过滤完成: {len(track_list)} -> {len(final_list)} 张专辑[/]")
+
+        try:
+            self._run_multithreaded_download(final_list, self.path, None, None, ind_cover=True, track_fmt=self.fmt_single)
+        finally:
+            self.session.close()
         console.print(f"[bold green]✔ {content_name} 流程结束[/]")
 
-    def _run_multithreaded_download(self, tracks, dirn, meta, is_multiple, ind_cover, track_fmt):
+    def _run_multithreaded_download(self, tracks, dirn, meta, disc_dirs, ind_cover, track_fmt):
         failed_list = []
         total_items = len(tracks)
         
-        progress = Progress(
-            TextColumn("{task.description}", justify="left"), 
-            BarColumn(bar_width=15), 
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            DownloadColumn(),
-            TransferSpeedColumn(),
-            TimeRemainingColumn(),
-            console=console, 
-            transient=True
-        )
-        
-        with progress:
+        with _live_progress() as progress:
             overall_task_id = progress.add_task(f"[green]总进度 ({total_items} 项)[/]", filename="Batch", total=total_items)
             
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = []
-                for idx, item in enumerate(tracks):
-                    futures.append(executor.submit(
-                        self._process_single_track, 
-                        item, 
-                        idx + 1, 
-                        total_items,
-                        meta, dirn, is_multiple, 
-                        progress, overall_task_id, failed_list, 
-                        ind_cover, track_fmt
-                    ))
-                for future in as_completed(futures): 
-                    future.result()
+            workers_count = min(MAX_WORKERS, total_items)
+            task_slots = queue.Queue()
+            for _ in range(workers_count):
+                task_slots.put(progress.add_task("", filename="", start=False, visible=False))
+
+            # 常驻工作线程从有界队列取任务，None 为结束标记；队列有界，上千项也不会一次性入队
+            work_q = queue.Queue(maxsize=MAX_WORKERS * 2)
+
+            def worker():
+                while True:
+                    job = work_q.get()
+                    if job is None:
+                        return
+                    if self._shutdown.is_set():
+                        continue # 已取消：只清空队列，直到收到结束标记
+                    idx, item = job
+                    # 线程不能因意外异常退出，否则生产者会阻塞在已满的队列上
+                    try:
+                        self._process_single_track(
+                            item,
+                            idx + 1,
+                            total_items,
+                            meta, dirn, disc_dirs,
+                            progress, overall_task_id, failed_list,
+                            ind_cover, track_fmt, task_slots
+                        )
+                    except Exception as e:
+                        failed_list.append(f"{item.get('title', 'Unknown')} - {e}")
+
+            workers = [threading.Thread(target=worker, daemon=True) for _ in range(workers_count)]
+            for t in workers:
+                t.start()
+            try:
+                for job in enumerate(tracks):
+                    work_q.put(job)
+                for _ in workers:
+                    work_q.put(None)
+                for t in workers:
+                    t.join()
+            except KeyboardInterrupt:
+                # 通知工作线程尽快退出并等待其结束，确保临时文件不再被写入后才交给 cli 清理
+                self._shutdown.set()
+                for _ in workers:
+                    work_q.put(None)
+                for t in workers:
+                    t.join()
+                raise
+
+        # 取消时已完成的部分不代表整批成功，交由调用方处理 (不报告成功、不记录数据库)
+        if self._shutdown.is_set():
+            raise DownloadCancelled("下载已取消")
 
         if failed_list:
             console.rule("[bold red]下载完成，但存在错误[/]")
             for fail in failed_list:
                 console.print(f"[red]❌ {fail}[/]")
             console.print("\n[bold yellow]建议检查：\n1. 您的 Qobuz 订阅是否包含这些曲目\n2. 您的网络环境是否稳定 (已自动重试3次)[/]")
-        else:
-            console.print("[bold green]✨ 所有内容下载成功！[/]")
+            return False
+        console.print("[bold green]✨ 所有内容下载成功！[/]")
+        return True
 
     def download_track(self):
         try:
             meta = self.client.get_track_meta(self.item_id)
             parse = self.client.get_track_url(self.item_id, self.quality)
-            
-            progress = Progress(
-                TextColumn("{task.description}", justify="left"),
-                BarColumn(bar_width=15),
-                TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                DownloadColumn(),
-                TransferSpeedColumn(),
-                TimeRemainingColumn(),
-                console=console, transient=True
-            )
-            
-            with progress:
+
+            with _live_progress() as progress:
                 track_num = meta.get('track_number', 0)
                 disp_name = f"{track_num:02d}. {meta.get('title', 'Unknown')}"[:30]
                 task_id = progress.add_task(description=disp_name, filename=disp_name, start=False)
                 
                 is_mp3 = True if int(self.quality) == 5 else False
                 try:
-                    self._download_and_tag(self.path, 1, parse, meta, meta, True, is_mp3, None, progress, task_id, ind_cover=True, track_fmt=self.fmt_single)
+                    self._download_and_tag(self.path, parse, meta, meta, True, is_mp3, None, progress, task_id, ind_cover=True, track_fmt=self.fmt_single)
+                    return True
+                except DownloadCancelled:
+                    raise
                 except Exception as e:
                      console.print(f"[red]下载失败: {e}[/red]")
+        except DownloadCancelled:
+            raise
         except Exception as e: console.print(f"[red]获取元数据失败: {e}[/red]")
+        return False
 
-    def _download_and_tag(self, root_dir, tmp_count, track_url_dict, track_metadata, album_or_track_metadata, is_track, is_mp3, multiple, progress, task_id, ind_cover, track_fmt):
+    def _download_and_tag(self, root_dir, track_url_dict, track_metadata, album_or_track_metadata, is_track, is_mp3, disc_dir, progress, task_id, ind_cover, track_fmt):
         extension = ".mp3" if is_mp3 else ".flac"
-        try: url = track_url_dict["url"]
-        except: return
+        url = track_url_dict.get("url")
+        if not url: return
 
-        if multiple:
-            root_dir = os.path.join(root_dir, f"Disc {multiple}")
-            os.makedirs(root_dir, exist_ok=True)
-            
-        filename = os.path.join(root_dir, f".{tmp_count:02}.tmp")
-        artist = _safe_get(track_metadata, "performer", "name")
-        filename_attr = self._get_filename_attr(artist, track_metadata, track_metadata.get("title", "Unknown"), track_url_dict)
-        formatted_name = sanitize_filename(track_fmt.format(**filename_attr))
+        # disc_dir 由 _make_disc_dirs 预先创建，这里不再逐曲 makedirs
+        if disc_dir:
+            root_dir = disc_dir
+
+        # 先在本地算出最终文件名并检查是否存在，已存在则不发起任何音频请求
+        formatted_name = _track_namer(track_fmt)(track_metadata, track_url_dict)
         final_file = os.path.join(root_dir, formatted_name)[:240] + extension
-        
+        img_path = os.path.join(root_dir, formatted_name)[:240] + ".jpg"
+
         if os.path.isfile(final_file):
             progress.update(task_id, visible=False)
+            if ind_cover:
+                self._save_track_cover(img_path, track_metadata, album_or_track_metadata)
             return
 
-        max_retries = 3
-        success = False
-        last_error = None
+        # 临时文件名以 O_EXCL 独占创建，不同碟/并发线程不会撞名
+        filename = _reserve_part_file(root_dir)
+        try:
+            max_retries = 3
+            for attempt in range(max_retries):
+                try:
+                    # 每次尝试都以截断方式重新写入同一临时文件，重试前无需删除
+                    self._fetch_audio(url, filename, progress, task_id)
+                    break
+                except STREAM_ERRORS + (requests.exceptions.HTTPError,) as e:
+                    if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code not in RETRY_STATUS:
+                        raise
+                    if attempt + 1 == max_retries:
+                        raise Exception(f"重试3次后失败: {e}")
+                    if ind_cover:
+                        console.print(f"[yellow]重试 ({attempt + 1}/{max_retries})... {formatted_name}[/]")
+                    if self._shutdown.wait(3):
+                        raise DownloadCancelled("下载已取消")
+                    progress.update(task_id, completed=0)
+
+            # 单曲封面在写标签前保存，embed_art 时才能被 metadata 找到并嵌入
+            if ind_cover:
+                self._save_track_cover(img_path, track_metadata, album_or_track_metadata)
 
-        for attempt in range(max_retries):
             try:
-                response = requests.get(url, stream=True, timeout=30)
-                response.raise_for_status()
-                total_length = int(response.headers.get("content-length", 0))
-                
-                progress.update(task_id, completed=0, total=total_length)
-                progress.start_task(task_id)
-                
-                with open(filename, "wb") as file:
-                    for chunk in response.iter_content(chunk_size=32768):
-                        if chunk:
-                            file.write(chunk)
-                            progress.advance(task_id, len(chunk))
-                success = True
-                break 
-            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
-                last_error = e
-                if ind_cover: 
-                    console.print(f"[yellow]重试 ({attempt + 1}/{max_retries})... {formatted_name}[/]")
-                time.sleep(3)
-                if os.path.exists(filename):
-                    try: os.remove(filename)
-                    except: pass
-                progress.update(task_id, completed=0)
-            except Exception as e:
-                raise e
-
-        if not success:
-            raise Exception(f"重试3次后失败: {last_error}")
+                metadata.tag_mp3(filename, root_dir, final_file, track_metadata, album_or_track_metadata, is_track, self.embed_art) if is_mp3 else \
+                metadata.tag_flac(filename, root_dir, final_file, track_metadata, album_or_track_metadata, is_track, self.embed_art)
+            except: pass
 
+            # 标签直接写入临时文件 (final_file 只用于查找封面)，写完后原子替换为最终文件
+            os.replace(filename, final_file)
+        except BaseException:
+            try: os.remove(filename)
+            except OSError: pass
+            raise
+
+    def _fetch_audio(self, url, filename, progress, task_id):
+        # 分段下载先用 HEAD 探测大小与 Range 支持，避免打开整文件 GET 后再丢弃连接
+        total_length = self._probe_range_size(url) if self.parallel_chunks else 0
+        if total_length:
+            progress.update(task_id, completed=0, total=total_length)
+            progress.start_task(task_id)
+            if self._download_ranges(url, filename, total_length, progress, task_id):
+                return
+            # 服务器未按分段返回 (如 416)，退回整文件串行下载
+
+        with self.session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            total_length = int(response.headers.get("content-length", 0))
+
+            progress.update(task_id, completed=0, total=total_length)
+            progress.start_task(task_id)
+            self._write_body(response, filename, progress, task_id, self._shutdown)
+
+    def _probe_range_size(self, url):
+        # 文件足够大且服务器支持 Range 时返回文件大小，否则返回 0
         try:
-            metadata.tag_mp3(filename, root_dir, final_file, track_metadata, album_or_track_metadata, is_track, self.embed_art) if is_mp3 else \
-            metadata.tag_flac(filename, root_dir, final_file, track_metadata, album_or_track_metadata, is_track, self.embed_art)
-        except: pass
-        
-        if os.path.exists(filename):
-            try: os.rename(filename, final_file)
-            except: pass
-            
-        if ind_cover and not self.no_cover:
-            img_url = album_or_track_metadata.get("image", {}).get("large")
-            if not img_url and track_metadata.get("album"): img_url = track_metadata["album"].get("image", {}).get("large")
-            if img_url:
-                img_path = os.path.join(root_dir, formatted_name)[:240] + ".jpg"
-                if not os.path.exists(img_path):
-                    try:
-                        r_img = requests.get(img_url.replace("_600.", "_org.") if self.cover_og_quality else img_url)
-                        with open(img_path, "wb") as f_img: f_img.write(r_img.content)
-                    except: pass
+            response = self.session.head(url, allow_redirects=True, timeout=30)
+        except requests.exceptions.RequestException:
+            return 0
+        if not response.ok or response.headers.get("accept-ranges", "").lower() != "bytes":
+            return 0
+        total_length = int(response.headers.get("content-length", 0))
+        return total_length if total_length > RANGE_MIN_SIZE else 0
 
     @staticmethod
-    def _get_filename_attr(artist, track_metadata, track_title, url_dict=None):
-        sr = track_metadata.get("maximum_sampling_rate", 44.1)
-        if url_dict and url_dict.get("sampling_rate"): sr = url_dict["sampling_rate"]
-        if sr > 1000: sr = sr / 1000
-        sr_str = f"{sr:g}"
-        bd = track_metadata.get("maximum_bit_depth", 16)
-        if url_dict and url_dict.get("bit_depth"): bd = url_dict["bit_depth"]
-        return {"artist": artist, "bit_depth": bd, "sampling_rate": sr_str, "tracktitle": track_title, "tracknumber": f"{track_metadata.get('track_number', 0):02}"}
+    def _write_body(response, filename, progress, task_id, cancel=None):
+        # 直接从底层连接拷贝，进度条限频刷新
+        # (urllib3 的 readinto 内部仍是 read 后再复制，复用缓冲区并不能减少分配)
+        response.raw.decode_content = True
+        with open(filename, "wb") as file:
+            writer = _ProgressWriter(file, progress, task_id, cancel=cancel)
+            shutil.copyfileobj(response.raw, writer, COPY_BUFSIZE)
+            writer.flush_progress()
+
+    def _download_ranges(self, url, filename, total_length, progress, task_id):
+        # 分 RANGE_PARTS 段并发写入预分配的文件；服务器未返回 206 时返回 False
+        part = -(-total_length // RANGE_PARTS)
+        ranges = [(start, min(start + part, total_length) - 1) for start in range(0, total_length, part)]
+
+        def fetch(byte_range):
+            start, end = byte_range
+            with self.session.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=30) as r:
+                if r.status_code != 206:
+                    return False
+                r.raw.decode_content = True
+                target = _PositionalFile(fd, start)
+                writer = _ProgressWriter(target, progress, task_id, cancel=self._shutdown)
+                shutil.copyfileobj(r.raw, writer, COPY_BUFSIZE)
+                writer.flush_progress()
+                if target.offset != end + 1:
+                    raise ProtocolError(f"分段下载不完整: {target.offset - start}/{end + 1 - start} 字节")
+            return True
+
+        fd = os.open(filename, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(fd, total_length)
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                return all(list(executor.map(fetch, ranges)))
+        finally:
+            os.close(fd)
+
+    def _save_track_cover(self, img_path, track_metadata, album_or_track_metadata):
+        if self.no_cover or os.path.exists(img_path):
+            return
+        img_url = album_or_track_metadata.get("image", {}).get("large")
+        if not img_url and track_metadata.get("album"): img_url = track_metadata["album"].get("image", {}).get("large")
+        if not img_url:
+            return
+        try:
+            self._store_cover(img_url.replace("_600.", "_org.") if self.cover_og_quality else img_url, img_path)
+        except: pass
+
+    def _store_cover(self, img_url, img_path):
+        with self._cover_lock:
+            saved = self._cover_cache.get(img_url)
+            if saved is None:
+                url_lock = self._cover_locks.setdefault(img_url, threading.Lock())
+        # 同一 URL 只由一个线程下载，其余线程等待后复制已保存的文件 (内存中不保留图片数据)
+        if saved is None:
+            with url_lock:
+                with self._cover_lock:
+                    saved = self._cover_cache.get(img_url)
+                if saved is None:
+                    r_img = self.session.get(img_url, timeout=30)
+                    r_img.raise_for_status()
+                    with open(img_path, "wb") as f_img: f_img.write(r_img.content)
+                    with self._cover_lock:
+                        self._cover_cache[img_url] = img_path
+                        self._cover_locks.pop(img_url, None)
+                    return
+        shutil.copyfile(saved, img_path)
+
+    def _skip_existing_tracks(self, album_dir, tracks, disc_dirs):
+        # 仅凭本地元数据剔除已存在的曲目；文件名按 maximum_bit_depth/maximum_sampling_rate 生成，画质不同的文件不算已存在
+        extension = ".mp3" if int(self.quality) == 5 else ".flac"
+        make_name = _track_namer(self.fmt_album)
+        existing = {}
+        remaining = []
+        for track in tracks:
+            track_dir = _disc_dir(disc_dirs, track) or album_dir
+            if track_dir not in existing:
+                existing[track_dir] = _existing_names(track_dir, extension)
+            # 与 _download_and_tag 的 final_file 计算方式一致 (含 240 字符截断)
+            final_file = os.path.join(track_dir, make_name(track))[:240] + extension
+            if os.path.basename(final_file) not in existing[track_dir]:
+                remaining.append(track)
+        return remaining
+
+    def _get_track_url(self, track_id):
+        # dict.pop 是原子操作，多线程下每个预取结果只会被使用一次
+        parse = self._prefetched_url.pop(track_id, None)
+        if parse is None:
+            parse = self.client.get_track_url(track_id, fmt_id=self.quality)
+        return parse
 
     @staticmethod
     def _get_album_attr(meta, album_title, file_format, bit_depth, sampling_rate):
@@ -390,7 +695,11 @@ class Download:
         if int(self.quality) == 5: return ("MP3", quality_met, None, None)
         track_dict = item_dict if is_track_id else item_dict["tracks"]["items"][0]
         try:
-            new_track_dict = self.client.get_track_url(track_dict["id"], fmt_id=self.quality) if not track_url_dict else track_url_dict
+            if not track_url_dict:
+                new_track_dict = self.client.get_track_url(track_dict["id"], fmt_id=self.quality)
+                self._prefetched_url[track_dict["id"]] = new_track_dict
+            else:
+                new_track_dict = track_url_dict
             if int(self.quality) > 6 and new_track_dict.get("bit_depth") == 16: quality_met = False
             return ("FLAC", quality_met, new_track_dict["bit_depth"], new_track_dict["sampling_rate"])
         except: return ("Unknown", quality_met, None, None)
@@ -401,14 +710,79 @@ def _get_title(item_dict):
     if version: album_title = f"{album_title} ({version})" if version.lower() not in album_title.lower() else album_title
     return album_title
 
-def _get_extra(item, dirn, extra="cover.jpg", og_quality=False):
+def _get_extra(item, dirn, extra="cover.jpg", og_quality=False, session=None):
     extra_file = os.path.join(dirn, extra)
     if os.path.isfile(extra_file): return
     try:
-        r = requests.get(item.replace("_600.", "_org.") if og_quality else item)
+        r = (session or requests).get(item.replace("_600.", "_org.") if og_quality else item)
         with open(extra_file, "wb") as f: f.write(r.content)
     except: pass
 
+@lru_cache(maxsize=2048)
+def _sanitize_filename(name):
+    return sanitize_filename(name)
+
+def _sampling_rate(track_metadata, url_dict):
+    sr = track_metadata.get("maximum_sampling_rate", 44.1)
+    if url_dict and url_dict.get("sampling_rate"): sr = url_dict["sampling_rate"]
+    if sr > 1000: sr = sr / 1000
+    return f"{sr:g}"
+
+def _bit_depth(track_metadata, url_dict):
+    bd = track_metadata.get("maximum_bit_depth", 16)
+    if url_dict and url_dict.get("bit_depth"): bd = url_dict["bit_depth"]
+    return bd
+
+# 曲目文件名模板可用的字段: (曲目元数据, 下载链接信息) -> 值
+FILENAME_FIELDS = {
+    "artist": lambda t, u: _safe_get(t, "performer", "name"),
+    "tracktitle": lambda t, u: t.get("title", "Unknown"),
+    "tracknumber": lambda t, u: f"{t.get('track_number', 0):02}",
+    "bit_depth": _bit_depth,
+    "sampling_rate": _sampling_rate,
+}
+
+@lru_cache(maxsize=32)
+def _track_namer(fmt):
+    # 模板只解析一次，返回 (曲目元数据, 下载链接信息) -> 文件名 的函数，每首只计算模板用到的字段
+    fields = {name for _, name, _, _ in Formatter().parse(fmt) if name}
+    getters = [(name, FILENAME_FIELDS[name]) for name in fields]
+
+    def make_name(track_metadata, url_dict=None):
+        return _sanitize_filename(fmt.format_map({name: get(track_metadata, url_dict) for name, get in getters}))
+    return make_name
+
+def _make_disc_dirs(album_dir, tracks):
+    # 多碟专辑一次性创建 Disc N 目录，返回 {media_number: 路径}；单碟专辑返回 None
+    discs = {t.get("media_number", 1) for t in tracks}
+    if len(discs) < 2:
+        return None
+    disc_dirs = {}
+    for disc in discs:
+        disc_dirs[disc] = os.path.join(album_dir, f"Disc {disc}")
+        os.makedirs(disc_dirs[disc], exist_ok=True)
+    return disc_dirs
+
+def _disc_dir(disc_dirs, track):
+    return disc_dirs.get(track.get("media_number", 1)) if disc_dirs else None
+
+def _reserve_part_file(directory):
+    # 以 O_EXCL 原子创建唯一的空 .dl-*.part 文件；权限按 umask 计算 (tempfile 为 0o600)，因为它最终会成为曲目文件
+    while True:
+        path = os.path.join(directory, f".dl-{secrets.token_hex(6)}.part")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            return path
+        except FileExistsError:
+            continue
+
+def _existing_names(directory, extension):
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return set()
+    return {n for n in names if n.endswith(extension)}
+
 def _safe_get(d: dict, *keys, default=None):
     curr = d
     for key in keys:
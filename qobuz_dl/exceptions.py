@@ -20,3 +20,7 @@ class InvalidQuality(Exception):
 
 class NonStreamable(Exception):
     pass
+
+
+class DownloadCancelled(Exception):
+    pass
@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 专辑元数据跨运行缓存有效期 (1 天)，曲目可用性与下载地址会变化，不宜过长
+TTL = 86400
+# 仅保留最近的若干张专辑，避免缓存文件无限增长
+MAX_ENTRIES = 512
+
+# 只保存下载、命名与写标签实际读取的字段，完整的 album/get 响应体积大得多
+ALBUM_FIELDS = ("id", "title", "version", "streamable", "release_date_original",
+                "genres_list", "copyright", "tracks_count")
+TRACK_FIELDS = ("id", "title", "version", "work", "track_number", "media_number",
+                "maximum_sampling_rate", "maximum_bit_depth")
+
+
+def _pick(d, fields):
+    return {k: d[k] for k in fields if k in d}
+
+
+def _name_only(d, key):
+    value = d.get(key)
+    return {key: {"name": value.get("name")}} if isinstance(value, dict) else {}
+
+
+def slim_album(meta):
+    album = _pick(meta, ALBUM_FIELDS)
+    album.update(_name_only(meta, "artist"))
+    album.update(_name_only(meta, "label"))
+    if "image" in meta:
+        album["image"] = {"large": meta["image"].get("large")}
+    if "tracks" in meta:
+        album["tracks"] = {"items": [
+            dict(_pick(t, TRACK_FIELDS), **_name_only(t, "performer"))
+            for t in meta["tracks"].get("items", [])
+        ]}
+    return album
+
+
+def load(cache_file, ttl=TTL):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if time.time() - cache["ts"] < ttl:
+            return cache["ts"], dict(cache["albums"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def save(cache_file, albums, ts=None):
+    # ts 沿用读取时的时间戳，缓存中最旧的条目不会因重复保存而续期
+    items = [(k, slim_album(v)) for k, v in list(albums.items())[-MAX_ENTRIES:]]
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"ts": ts or time.time(), "albums": dict(items)}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug(f"Failed to save album meta cache: {e}")
@@ -1,10 +1,9 @@
 import hashlib
 import logging
+import threading
 import time
 from datetime import date
 
-import requests
-
 from qobuz_dl.exceptions import (
     AuthenticationError,
     IneligibleError,
@@ -13,6 +12,7 @@ from qobuz_dl.exceptions import (
     InvalidQuality,
 )
 from qobuz_dl.color import GREEN, YELLOW
+from qobuz_dl.session import SESSION
 
 from rich.console import Console
 console = Console()
@@ -23,21 +23,22 @@ logger = logging.getLogger(__name__)
 
 
 class Client:
-    def __init__(self, email, pwd, app_id, secrets, use_token, user_id, user_auth_token):
+    def __init__(self, email, pwd, app_id, secrets, use_token, user_id, user_auth_token, session=None, album_meta=None):
         console.print(f"[dim]正在登录 API...[/dim]")
         self.secrets = secrets
         self.id = str(app_id)
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:83.0) Gecko/20100101 Firefox/83.0",
-                "X-App-Id": self.id,
-                "Content-Type": "application/json;charset=UTF-8"
-
-            }
-        )
+        # 会话可能与其他模块共享，Qobuz 专用请求头按请求单独发送
+        self.session = session or SESSION
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:83.0) Gecko/20100101 Firefox/83.0",
+            "X-App-Id": self.id,
+            "Content-Type": "application/json;charset=UTF-8"
+        }
         self.base = "https://www.qobuz.com/api.json/0.2/"
         self.sec = None
+        # 专辑元数据缓存 (可由多个下载线程并发填充，album_meta 为上次运行保存的内容)
+        self._meta_cache = dict(album_meta or {})
+        self._meta_lock = threading.Lock()
         self.auth(email, pwd, use_token, user_id, user_auth_token)
         self.cfg_setup()
 
@@ -110,7 +111,7 @@ class Client:
             }
         else:
             params = kwargs
-        r = self.session.get(self.base + epoint, params=params)
+        r = self.session.get(self.base + epoint, params=params, headers=self.headers)
         if epoint == "user/login":
             if r.status_code == 401:
                 raise AuthenticationError("登录失败：Token 无效或过期。\n" + RESET)
@@ -132,7 +133,7 @@ class Client:
         if not usr_info["user"]["credential"]["parameters"]:
             raise IneligibleError("您的账户似乎不是付费订阅账户，无法下载。")
         self.uat = usr_info["user_auth_token"]
-        self.session.headers.update({"X-User-Auth-Token": self.uat})
+        self.headers["X-User-Auth-Token"] = self.uat
         self.label = usr_info["user"]["credential"]["parameters"]["short_label"]
         self.expiry_date = date.fromisoformat(usr_info["user"]["subscription"]["end_date"])
         console.print(f"[green]会员类型: {self.label} | 到期时间: {date.strftime(self.expiry_date, '%Y年%m月%d日')}[/]")
@@ -154,7 +155,17 @@ class Client:
             offset += 500
 
     def get_album_meta(self, id):
-        return self.api_call("album/get", id=id)
+        with self._meta_lock:
+            meta = self._meta_cache.get(id)
+        if meta is None:
+            meta = self.api_call("album/get", id=id)
+            with self._meta_lock:
+                self._meta_cache[id] = meta
+        return meta
+
+    def album_meta_snapshot(self):
+        with self._meta_lock:
+            return dict(self._meta_cache)
 
     def get_track_meta(self, id):
         return self.api_call("track/get", id=id)
@@ -171,7 +182,9 @@ class Client:
     def get_label_meta(self, id):
         return self.multi_meta("label/get", "albums_count", id, None)
 
-    # 移除了搜索相关函数，因为已经不需要了
+    def search_tracks(self, query, limit=1):
+        # 仅用于 last.fm 歌单匹配曲目
+        return self.api_call("track/search", query=query, limit=limit)
 
     def test_secret(self, sec):
         try:
@@ -0,0 +1,25 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 全局共享的 HTTP 会话：复用 TCP/TLS 连接 (keep-alive)，避免每次请求重新握手
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+)
+
+
+def new_session(pool_connections=16, pool_maxsize=64, max_retries=RETRY):
+    session = Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = new_session()
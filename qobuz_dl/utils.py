@@ -6,11 +6,22 @@ import time
 
 from mutagen.mp3 import EasyMP3
 from mutagen.flac import FLAC
+from pathvalidate import sanitize_filename
 
 logger = logging.getLogger(__name__)
 
 EXTENSIONS = (".mp3", ".flac")
 
+# 与 pathvalidate 默认行为一致：直接删除非法字符和控制字符
+_SANITIZE_TABLE = str.maketrans(
+    {c: None for c in '<>:"/\\|?*' + "".join(chr(i) for i in range(32))}
+)
+# Windows 保留设备名，以及多数文件系统的单个文件名长度上限 (字节)
+_RESERVED_NAMES = frozenset(
+    ["CON", "PRN", "AUX", "NUL"] + [f"{p}{i}" for p in ("COM", "LPT") for i in range(1, 10)]
+)
+_MAX_NAME_BYTES = 255
+
 
 class PartialFormatter(string.Formatter):
     def __init__(self, missing="n/a", bad_fmt="n/a"):
@@ -166,6 +177,19 @@ def format_duration(duration):
     return time.strftime("%H:%M:%S", time.gmtime(duration))
 
 
+def fast_sanitize(name):
+    """Single-pass filename sanitizer for the common case.
+
+    Falls back to pathvalidate when nothing usable is left, the name is a
+    reserved device name or it is longer than 255 bytes.
+    """
+    fixed = name.translate(_SANITIZE_TABLE).rstrip(". ")
+    if (not fixed or len(fixed.encode("utf-8")) > _MAX_NAME_BYTES
+            or fixed.split(".")[0].upper() in _RESERVED_NAMES):
+        return sanitize_filename(name)
+    return fixed
+
+
 def create_and_return_dir(directory):
     fix = os.path.normpath(directory)
     os.makedirs(fix, exist_ok=True)